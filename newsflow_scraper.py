@@ -20,6 +20,8 @@ import os
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import json
+import csv
+import hashlib
 from datetime import datetime
 import platform
 
@@ -33,11 +35,12 @@ logging.basicConfig(
     ]
 )
 
-# Load environment variables based on platform
-if platform.system() == 'Darwin':  # macOS
-    load_dotenv('/Users/jaykrish/Documents/digitalocean/.env')
-else:  # Server (Linux)
-    load_dotenv('/root/.env')
+# Load environment variables based on platform (skipped when the URL and a key are already exported)
+if not (os.getenv('SUPABASE_URL') and (os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY'))):
+    if platform.system() == 'Darwin':  # macOS
+        load_dotenv('/Users/jaykrish/Documents/digitalocean/.env')
+    else:  # Server (Linux)
+        load_dotenv('/root/.env')
 
 # Supabase configuration
 supabase_url = os.getenv('SUPABASE_URL') or "https://aisqbjjpdztnuerniefl.supabase.co"
@@ -52,6 +55,13 @@ print(f"Using Supabase database: {supabase_url}")
 
 # Configuration
 COOKIES_FILE_NAME = "cookies.json"
+UPSERT_BATCH_SIZE = 500
+NEWS_PROVIDERS = ['Reuters', 'Moneycontrol', 'CNBC TV18', 'Bloomberg', 'Economic Times', 'PTI', 'ANI']
+
+# Set TV_REUSE_BROWSER to attach to a long-lived Chromium started with
+# --remote-debugging-port=9222 --user-data-dir=/var/cache/tv-profile
+REUSE_BROWSER = bool(os.environ.get('TV_REUSE_BROWSER'))
+BROWSER_DEBUGGER_ADDRESS = os.environ.get('TV_DEBUGGER_ADDRESS', '127.0.0.1:9222')
 TARGET_URL = "https://www.tradingview.com/news-flow/j1vPNkYi?market_country=in&market=stock,economic&economic_category=gdp,labor,prices,health,money,trade,government,business,consumer,housing,taxes"
 
 
@@ -94,6 +104,25 @@ def setup_driver():
         sys.exit(1)
 
 
+def attach_to_browser():
+    """Attach to an already running Chrome via remote debugging; returns None if unavailable"""
+    options = webdriver.ChromeOptions()
+    options.debugger_address = BROWSER_DEBUGGER_ADDRESS
+
+    try:
+        if platform.system() == 'Linux':
+            service = Service(executable_path='/usr/bin/chromedriver')
+            driver = webdriver.Chrome(service=service, options=options)
+        else:
+            driver = webdriver.Chrome(options=options)
+
+        logging.info(f"Attached to running browser at {BROWSER_DEBUGGER_ADDRESS}")
+        return driver
+    except WebDriverException as e:
+        logging.warning(f"Could not attach to browser at {BROWSER_DEBUGGER_ADDRESS}, starting a new one: {e}")
+        return None
+
+
 def load_cookies(driver):
     """Load cookies from cookies.json file"""
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -122,20 +151,30 @@ def load_cookies(driver):
         driver.get("https://www.tradingview.com")
         time.sleep(2)
 
-        added_count = 0
-        for cookie in cookies_list:
-            try:
-                # Only include necessary cookie attributes
-                cookie_to_add = {
-                    'name': cookie['name'],
-                    'value': cookie['value'],
-                    'domain': cookie.get('domain', '.tradingview.com'),
-                    'path': cookie.get('path', '/')
-                }
-                driver.add_cookie(cookie_to_add)
-                added_count += 1
-            except Exception as e:
-                pass  # Skip problematic cookies silently
+        # Only include necessary cookie attributes; set them all in one CDP call
+        cdp_cookies = [
+            {
+                'name': cookie['name'],
+                'value': cookie['value'],
+                'domain': cookie.get('domain', '.tradingview.com'),
+                'path': cookie.get('path', '/')
+            }
+            for cookie in cookies_list
+            if isinstance(cookie, dict) and 'name' in cookie and 'value' in cookie
+        ]
+        try:
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': cdp_cookies})
+            added_count = len(cdp_cookies)
+        except Exception as e:
+            # One rejected cookie fails the whole CDP call; add them one by one instead
+            logging.warning(f"Batch cookie injection via CDP failed: {e}. Adding cookies one by one.")
+            added_count = 0
+            for cookie_to_add in cdp_cookies:
+                try:
+                    driver.add_cookie(cookie_to_add)
+                    added_count += 1
+                except Exception:
+                    pass  # Skip problematic cookies silently
 
         logging.info(f"Added {added_count} cookies out of {len(cookies_list)} total cookies")
         return True
@@ -144,21 +183,37 @@ def load_cookies(driver):
         return False
 
 
-def scroll_to_load_more(driver, scroll_count=5, scroll_pause=2):
-    """Scroll down to load more news items"""
+ARTICLE_COUNT_JS = "return document.querySelectorAll('article').length"
+
+
+def scroll_to_load_more(driver, scroll_count=5, max_wait=4):
+    """Scroll down to load more news items, waiting until new articles render"""
+    prev_count = driver.execute_script(ARTICLE_COUNT_JS)
     for i in range(scroll_count):
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(scroll_pause)
-        logging.info(f"Scroll {i+1}/{scroll_count} completed")
+        try:
+            WebDriverWait(driver, max_wait).until(
+                lambda d: d.execute_script(ARTICLE_COUNT_JS) > prev_count
+            )
+        except TimeoutException:
+            logging.info(f"No new articles after scroll {i+1}, stopping")
+            break
+        prev_count = driver.execute_script(ARTICLE_COUNT_JS)
+        logging.info(f"Scroll {i+1}/{scroll_count} completed ({prev_count} articles)")
+
+
+def install_providers(driver):
+    """Install the provider lookup set on the page once, for reuse by extract_news_headlines"""
+    driver.execute_script("window.__tvProviders = new Set(arguments[0]);", NEWS_PROVIDERS)
 
 
 def extract_news_headlines(driver):
-    """Extract news headlines from the page using JavaScript"""
+    """Extract news headlines from the page using JavaScript (requires install_providers)"""
 
     js_code = """
     const articles = document.querySelectorAll('article');
     const news = [];
-    const providers = ['Reuters', 'Moneycontrol', 'CNBC TV18', 'Bloomberg', 'Economic Times', 'PTI', 'ANI'];
+    const providers = window.__tvProviders;
 
     articles.forEach(article => {
         try {
@@ -175,7 +230,7 @@ def extract_news_headlines(driver):
             const allDivs = article.querySelectorAll('div');
             for (const div of allDivs) {
                 const text = div.textContent.trim();
-                if (providers.includes(text)) {
+                if (providers.has(text)) {
                     provider = text;
                     break;
                 }
@@ -199,7 +254,7 @@ def extract_news_headlines(driver):
                 // Look for leaf divs (no children or only text nodes) with substantial text
                 if (children === 0 &&
                     text.length > 30 &&
-                    !providers.includes(text) &&
+                    !providers.has(text) &&
                     !text.includes('GMT') &&
                     !text.includes('Sign in') &&
                     !text.includes('Less than')) {
@@ -281,32 +336,23 @@ def save_to_supabase(news_data):
     # Get existing URLs to avoid duplicates
     existing_urls = get_existing_urls()
 
-    # Prepare records - only new ones
-    records = []
-    skipped = 0
-    for item in news_data:
-        url = item.get('url', '')
-
-        # Skip if URL already exists in database
-        if url in existing_urls:
-            skipped += 1
-            continue
-
-        if item.get('headline'):
-            # Generate unique tweet_id from URL hash
-            import hashlib
-            tweet_id = hashlib.md5(url.encode()).hexdigest()[:20]
-
-            record = {
-                'tweet_id': f"tv_{tweet_id}",
-                'article_title': item['headline'][:500],
-                'article_description': item['headline'][:500],
-                'article_url': url,
-                'username': item.get('provider', 'TradingView'),
-                'posted_at': datetime.now().isoformat(),
-                'is_critical': False
-            }
-            records.append(record)
+    # Prepare records - only new ones with a headline
+    df = pd.DataFrame(news_data).drop_duplicates(subset='url', keep='first')
+    is_existing = df['url'].isin(existing_urls)
+    skipped = int(is_existing.sum())
+    df = df[~is_existing & df['headline'].fillna('').astype(bool)]
+
+    # Generate unique tweet_id from URL hash
+    headlines = df['headline'].str.slice(0, 500)
+    records = pd.DataFrame({
+        'tweet_id': 'tv_' + df['url'].map(lambda url: hashlib.md5(url.encode()).hexdigest()[:20]),
+        'article_title': headlines,
+        'article_description': headlines,
+        'article_url': df['url'],
+        'username': df['provider'].fillna('TradingView'),
+        'posted_at': datetime.now().isoformat(),
+        'is_critical': False
+    }).to_dict('records')
 
     logging.info(f"Skipped {skipped} existing records, {len(records)} new records to insert")
 
@@ -316,10 +362,11 @@ def save_to_supabase(news_data):
 
     try:
         # Upsert into twitter_posted_tweets table (handles duplicates gracefully)
-        response = supabase.table('twitter_posted_tweets').upsert(
-            records,
-            on_conflict='tweet_id'
-        ).execute()
+        for i in range(0, len(records), UPSERT_BATCH_SIZE):
+            supabase.table('twitter_posted_tweets').upsert(
+                records[i:i + UPSERT_BATCH_SIZE],
+                on_conflict='tweet_id'
+            ).execute()
         logging.info(f"Successfully saved {len(records)} new news headlines to Supabase")
         return True
     except Exception as e:
@@ -331,12 +378,16 @@ def main():
     """Main execution function"""
     logging.info("Starting TradingView News Flow extraction...")
 
-    driver = setup_driver()
+    driver = attach_to_browser() if REUSE_BROWSER else None
+    reused_browser = driver is not None
+    if not reused_browser:
+        driver = setup_driver()
 
     try:
-        # Load cookies first
-        logging.info("Navigating to base domain to set cookies.")
-        load_cookies(driver)
+        # Load cookies first (a reused browser keeps them in its profile)
+        if not reused_browser:
+            logging.info("Navigating to base domain to set cookies.")
+            load_cookies(driver)
 
         # Navigate to news flow page
         logging.info(f"Navigating to target URL: {TARGET_URL}")
@@ -352,27 +403,27 @@ def main():
         except TimeoutException:
             logging.warning("Timeout waiting for articles, attempting to continue...")
 
+        install_providers(driver)
+
         # Take initial screenshot
         screenshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tradingview_newsflow.png')
         driver.save_screenshot(screenshot_path)
         logging.info(f"Screenshot saved to {screenshot_path}")
 
         # Scroll to load more news
-        scroll_to_load_more(driver, scroll_count=3, scroll_pause=2)
+        scroll_to_load_more(driver, scroll_count=3, max_wait=4)
 
         # Extract headlines
         news_data = extract_news_headlines(driver)
 
         if news_data:
-            # Create DataFrame for display
-            df = pd.DataFrame(news_data)
-            logging.info(f"Extracted {len(df)} news headlines")
+            logging.info(f"Extracted {len(news_data)} news headlines")
 
             # Display sample
             print("\n" + "="*80)
             print("EXTRACTED NEWS HEADLINES")
             print("="*80)
-            for i, row in df.head(20).iterrows():
+            for row in news_data[:20]:
                 print(f"\n[{row.get('provider', 'N/A')}] {row.get('timestamp', 'N/A')}")
                 print(f"  {row.get('headline', 'N/A')[:100]}...")
             print("\n" + "="*80)
@@ -382,7 +433,10 @@ def main():
 
             # Also save to CSV for backup
             csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'news_headlines.csv')
-            df.to_csv(csv_path, index=False)
+            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=news_data[0].keys())
+                writer.writeheader()
+                writer.writerows(news_data)
             logging.info(f"Saved to CSV: {csv_path}")
         else:
             logging.error("No news headlines extracted")
@@ -18,11 +18,12 @@ import platform
 # Get current script directory
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Load environment variables based on platform
-if platform.system() == 'Darwin':  # macOS
-    load_dotenv('/Users/jaykrish/Documents/digitalocean/.env')
-else:  # Server (Linux)
-    load_dotenv('/root/.env')
+# Load environment variables based on platform (skipped when the URL and a key are already exported)
+if not (os.getenv('SUPABASE_URL') and (os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_ANON_KEY'))):
+    if platform.system() == 'Darwin':  # macOS
+        load_dotenv('/Users/jaykrish/Documents/digitalocean/.env')
+    else:  # Server (Linux)
+        load_dotenv('/root/.env')
 
 # Setup logging
 logging.basicConfig(
@@ -93,7 +94,9 @@ def main():
         # Fetch data from Supabase
         logging.info("Fetching data from Supabase...")
         print(f"[{get_timestamp()}] Fetching data from Supabase...")
-        response = supabase.table('sector_data').select('*').execute()
+        response = supabase.table('sector_data').select(
+            'sector,market_cap,change_pct,perf_1w,perf_1m,perf_3m,perf_6m,perf_ytd,perf_1y,stocks'
+        ).execute()
         
         if not response.data:
             logging.warning("No data found in sector_data table.")
@@ -139,13 +142,12 @@ def main():
         update_count = 0
         error_count = 0
         
-        for index, row in sector_data.iterrows():
+        for sector, score_3m, score_6m, score_1y in zip(sector_data['sector'],
+                                                        sector_data['normalized_score_3m'],
+                                                        sector_data['normalized_score_6m'],
+                                                        sector_data['normalized_score_1y']):
             try:
                 # Handle NaN values by converting to None
-                score_3m = row['normalized_score_3m']
-                score_6m = row['normalized_score_6m']
-                score_1y = row['normalized_score_1y']
-                
                 update_data = {
                     'normalized_score_3m': round(float(score_3m), 4) if pd.notna(score_3m) else None,
                     'normalized_score_6m': round(float(score_6m), 4) if pd.notna(score_6m) else None,
@@ -154,19 +156,19 @@ def main():
                 }
                 
                 # Update record in Supabase
-                result = supabase.table('sector_data').update(update_data).eq('sector', row['sector']).execute()
+                result = supabase.table('sector_data').update(update_data).eq('sector', sector).execute()
                 
                 if result.data:
-                    logging.info(f"Updated scores for sector: {row['sector']}")
-                    print(f"[{get_timestamp()}] Updated scores for sector: {row['sector']}")
+                    logging.info(f"Updated scores for sector: {sector}")
+                    print(f"[{get_timestamp()}] Updated scores for sector: {sector}")
                     update_count += 1
                 else:
-                    logging.warning(f"Failed to update sector: {row['sector']}")
-                    print(f"[{get_timestamp()}] Failed to update sector: {row['sector']}")
+                    logging.warning(f"Failed to update sector: {sector}")
+                    print(f"[{get_timestamp()}] Failed to update sector: {sector}")
                     error_count += 1
                     
             except Exception as e:
-                logging.error(f"Error updating sector {row.get('sector', 'unknown')}: {str(e)}")
+                logging.error(f"Error updating sector {sector}: {str(e)}")
                 error_count += 1
 
         logging.info(f"Successfully updated {update_count} sector scores in Supabase. {error_count} errors.")
@@ -10,26 +10,160 @@ TradingView Data Downloader - Server Ready Version
 import os
 import time
 import json
+import csv
 import logging
 import subprocess
 import sys
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
+import argparse
+import shutil
+from datetime import datetime
+import requests
+# selenium and webdriver_manager are imported inside the browser helpers, so
+# importing this module for the scanner helpers doesn't pay their import cost
+
+try:
+    import inotify.adapters
+    import inotify.constants
+except ImportError:  # inotify is Linux-only; wait_for_download_complete falls back to polling
+    inotify = None
+
+try:
+    import ijson
+except ImportError:  # Only needed to stream very large cookies.json files
+    ijson = None
 
 # --- Configuration ---
 TRADINGVIEW_URL = "https://www.tradingview.com/screener/wgJk2W66/"
 COOKIES_FILE_NAME = "cookies.json"  # In the same directory as the script
+COOKIES_STREAM_THRESHOLD_BYTES = 1_000_000  # Larger cookie files are stream-parsed with ijson
 DOWNLOAD_DIR_NAME = "tradingview_downloads"
 DOWNLOAD_TIMEOUT_SECONDS = 120  # Max time to wait for download
 
+# --- Scanner API (HTTP fast path) ---
+SCANNER_URL = "https://scanner.tradingview.com/india/scan"
+SCANNER_TIMEOUT_SECONDS = 30
+SCANNER_MAX_ROWS = 5000
+# uploadtodb.py only picks up files starting with 'Technicals', so the scanner CSV is never uploaded
+SCANNER_CSV_PREFIX = "Scanner Technicals M"
+
+# (scanner field, CSV export header) pairs mirroring the "Technicals M" screener export.
+# The MACD columns appear twice because the screener export repeats them.
+SCANNER_COLUMNS = [
+    ('name', 'Symbol'),
+    ('description', 'Description'),
+    ('Recommend.All', 'Technical Rating 1 day'),
+    ('Recommend.MA', 'Moving Averages Rating 1 day'),
+    ('Recommend.Other', 'Oscillators Rating 1 day'),
+    ('RSI', 'Relative Strength Index (14) 1 day'),
+    ('Mom', 'Momentum (10) 1 day'),
+    ('AO', 'Awesome Oscillator 1 day'),
+    ('CCI20', 'Commodity Channel Index (20) 1 day'),
+    ('Stoch.K', 'Stochastic (14,3,3) 1 day, %K'),
+    ('Stoch.D', 'Stochastic (14,3,3) 1 day, %D'),
+    ('ROC', 'Rate of Change (9) 1 day'),
+    ('MACD.macd', 'Moving Average Convergence Divergence (12,26) 1 day, Level'),
+    ('MACD.signal', 'Moving Average Convergence Divergence (12,26) 1 day, Signal'),
+    ('ADX', 'Average Directional Index (14) 1 day'),
+    ('UO', 'Ultimate Oscillator (7,14,28) 1 day'),
+    ('Recommend.All|1W', 'Technical Rating 1 week'),
+    ('sector', 'Sector'),
+    ('industry', 'Industry'),
+    ('recommendation_mark', 'Analyst Rating'),
+    ('Perf.YTD', 'Performance % Year to date'),
+    ('Perf.Y', 'Performance % 1 year'),
+    ('Perf.6M', 'Performance % 6 months'),
+    ('Perf.3M', 'Performance % 3 months'),
+    ('Perf.1M', 'Performance % 1 month'),
+    ('Perf.W', 'Performance % 1 week'),
+    ('price_target_1y', 'Target price 1 year'),
+    ('fundamental_currency_code', 'Target price 1 year - Currency'),
+    ('price_target_1y_delta', 'Target price performance % 1 year'),
+    ('close', 'Price'),
+    ('currency', 'Price - Currency'),
+    ('SMA50', 'Simple Moving Average (50) 1 day'),
+    ('SMA200', 'Simple Moving Average (200) 1 day'),
+    ('BB.upper', 'Bollinger Bands (20) 1 day, Upper'),
+    ('SMA20', 'Bollinger Bands (20) 1 day, Basis'),
+    ('BB.lower', 'Bollinger Bands (20) 1 day, Lower'),
+    ('W.R', 'Williams Percent Range (14) 1 day'),
+    ('MACD.macd', 'Moving Average Convergence Divergence (12,26) 1 day, Level'),
+    ('MACD.signal', 'Moving Average Convergence Divergence (12,26) 1 day, Signal'),
+    ('ChaikinMoneyFlow', 'Chaikin Money Flow (20) 1 day'),
+    ('ChaikinMoneyFlow|1W', 'Chaikin Money Flow (20) 1 week'),
+    ('ChaikinMoneyFlow|1M', 'Chaikin Money Flow (20) 1 month'),
+    ('market_cap_basic', 'Market capitalization'),
+    ('fundamental_currency_code', 'Market capitalization - Currency'),
+    ('beta_1_year', 'Beta 1 year'),
+    ('Volatility.M', 'Volatility 1 month'),
+    ('Volatility.W', 'Volatility 1 week'),
+    ('indexes', 'Index'),
+]
+TECHNICAL_RATING_FIELDS = {'Recommend.All', 'Recommend.MA', 'Recommend.Other', 'Recommend.All|1W'}
+
+# XPath for the element that opens the export menu (the screener title header)
+MENU_TRIGGER_XPATH = "//*[@id='js-screener-container']/div[2]/div/div[1]/div[1]/div[1]/div/h2"
+
+# Resolves with the first visible, enabled element matching arguments[0] (an XPath, or a list
+# of XPaths tried in priority order on every check), or null after arguments[1] ms
+WAIT_FOR_XPATH_JS = """
+var xpaths = [].concat(arguments[0]), timeoutMs = arguments[1], done = arguments[arguments.length - 1];
+function find() {
+    for (var x = 0; x < xpaths.length; x++) {
+        var result = document.evaluate(xpaths[x], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        for (var i = 0; i < result.snapshotLength; i++) {
+            var el = result.snapshotItem(i);
+            if (!el.disabled && el.getClientRects().length > 0) return el;
+        }
+    }
+    return null;
+}
+var el = find();
+if (el) { done(el); return; }
+var observer = new MutationObserver(function() {
+    var el = find();
+    if (el) { observer.disconnect(); clearTimeout(timer); done(el); }
+});
+observer.observe(document, {childList: true, subtree: true, attributes: true});
+var timer = setTimeout(function() { observer.disconnect(); done(null); }, timeoutMs);
+"""
+
+# Known 'Download results as CSV' menu item variants, most specific first
+EXPORT_BUTTON_XPATHS = [
+    "//div[contains(text(), 'Download results as CSV')]",
+    "//div[contains(text(), 'Download results')]",
+    "//span[contains(text(), 'Download results')]",
+    "//*[contains(translate(text(), 'csv', 'CSV'), 'CSV')]",
+]
+
 # Get current script directory for server deployment
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Lock file created by the Xvfb server on display :99
+XVFB_LOCK_FILE = '/tmp/.X99-lock'
+
+# Pinned ChromeDriver binary, reused across runs to skip webdriver-manager's network lookup
+CHROMEDRIVER_PATH = os.environ.get('CHROMEDRIVER_PATH') or os.path.join(SCRIPT_DIR, '.wdm', 'chromedriver')
+# SessionNotCreatedException text when the pinned ChromeDriver is older than the installed Chrome
+CHROMEDRIVER_MISMATCH_TEXT = "only supports Chrome version"
+
+# Resources the screener export doesn't need; blocked over CDP to cut page-load time
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.webp', '*.gif', '*.woff*', '*.mp4',
+    '*google-analytics*', '*doubleclick*', '*sentry*'
+]
+
+# cookies.json keys copied onto each cookie as-is, and the alternative keys used for expiry
+COOKIE_KEYS = ('path', 'domain', 'secure', 'httpOnly')
+COOKIE_EXPIRY_KEYS = ('expires', 'expiry', 'expirationDate')
+COOKIE_SAME_SITE_VALUES = {'Strict', 'Lax', 'None'}
+
+# Persistent Chrome profile so cookies/localStorage survive between runs
+CHROME_PROFILE_DIR = os.path.join(SCRIPT_DIR, '.chrome-profile')
+
+# Set TV_REUSE_BROWSER to attach to a long-lived Chrome started with --remote-debugging-port=9222
+REUSE_BROWSER = bool(os.environ.get('TV_REUSE_BROWSER'))
+BROWSER_DEBUGGER_ADDRESS = os.environ.get('TV_DEBUGGER_ADDRESS', '127.0.0.1:9222')
+
 # --- Logging Setup ---
 logging.basicConfig(
     level=logging.INFO, 
@@ -46,12 +180,15 @@ def setup_virtual_display():
         # Set display environment variable
         os.environ['DISPLAY'] = ':99'
         
-        # Start virtual display if not already running
-        result = subprocess.run(['pgrep', 'Xvfb'], capture_output=True, text=True)
-        if result.returncode != 0:
+        # Start virtual display if not already running (the X server holds a lock file while up)
+        if not os.path.exists(XVFB_LOCK_FILE):
             subprocess.Popen(['Xvfb', ':99', '-screen', '0', '1920x1080x24'], 
                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            time.sleep(2)  # Wait for display to start
+            # Wait for display to start, up to 2 seconds
+            for _ in range(20):
+                if os.path.exists(XVFB_LOCK_FILE):
+                    break
+                time.sleep(0.1)
             logging.info("Virtual display started")
         else:
             logging.info("Virtual display already running")
@@ -61,9 +198,243 @@ def setup_virtual_display():
         return False
 
 # --- Helper Functions ---
-def setup_driver(download_abs_path):
+def stream_cookies_file(cookies_file_path):
+    """Yields cookie entries from cookies.json one at a time without loading the whole file."""
+    with open(cookies_file_path, 'rb') as f:
+        # Peek at the first non-whitespace byte to tell a bare list from {"cookies": [...]}
+        first_byte = f.read(1)
+        while first_byte.isspace():
+            first_byte = f.read(1)
+        f.seek(0)
+        prefix = 'item' if first_byte == b'[' else 'cookies.item'
+        yield from ijson.items(f, prefix, use_float=True)
+
+def read_cookies_file(cookies_file_path):
+    """Reads cookies.json and returns the cookie entries it contains.
+    
+    Files over COOKIES_STREAM_THRESHOLD_BYTES are streamed with ijson when it is installed.
+    """
+    if ijson is not None and os.path.getsize(cookies_file_path) > COOKIES_STREAM_THRESHOLD_BYTES:
+        logging.info("cookies.json is large; stream-parsing it with ijson.")
+        return stream_cookies_file(cookies_file_path)
+
+    with open(cookies_file_path, 'r') as f:
+        loaded_json_data = json.load(f)
+    
+    actual_cookies_list = []
+    if isinstance(loaded_json_data, list):
+        actual_cookies_list = loaded_json_data
+        logging.info("cookies.json appears to be a direct list of cookies.")
+    elif isinstance(loaded_json_data, dict) and 'cookies' in loaded_json_data and isinstance(loaded_json_data['cookies'], list):
+        actual_cookies_list = loaded_json_data['cookies']
+        logging.info("Extracted cookie list from 'cookies' key in cookies.json.")
+    else:
+        logging.warning("Could not find a list of cookies in cookies.json. The file might be malformed or in an unexpected structure.")
+        # Fallback: try to iterate over it directly if it's some other iterable, though unlikely to work
+        if hasattr(loaded_json_data, '__iter__') and not isinstance(loaded_json_data, (str, bytes)):
+             actual_cookies_list = list(loaded_json_data) 
+        else:
+            actual_cookies_list = []
+    return actual_cookies_list
+
+def get_session_cookies(base_script_path, cookies_file_name):
+    """Returns the (sessionid, sessionid_sign) pair from cookies.json, or (None, None) if unavailable."""
+    cookies_file_path = os.path.join(base_script_path, cookies_file_name)
+    if not os.path.exists(cookies_file_path):
+        logging.warning(f"Cookies file not found: {cookies_file_path}. Scanner request will be unauthenticated.")
+        return None, None
+
+    try:
+        cookies = {c['name']: c['value'] for c in read_cookies_file(cookies_file_path)
+                   if isinstance(c, dict) and 'name' in c and 'value' in c}
+    except Exception as e:
+        logging.error(f"Error reading session cookies: {e}")
+        return None, None
+    return cookies.get('sessionid'), cookies.get('sessionid_sign')
+
+def technical_rating_label(value):
+    """Converts a numeric technical rating (-1..1) into the label used by the CSV export."""
+    if value >= 0.5:
+        return 'Strong buy'
+    if value >= 0.1:
+        return 'Buy'
+    if value > -0.1:
+        return 'Neutral'
+    if value > -0.5:
+        return 'Sell'
+    return 'Strong sell'
+
+def analyst_rating_label(value):
+    """Converts a numeric analyst recommendation mark (1..5) into the label used by the CSV export."""
+    if value < 1.5:
+        return 'Strong buy'
+    if value < 2.5:
+        return 'Buy'
+    if value < 3.5:
+        return 'Neutral'
+    if value < 4.5:
+        return 'Sell'
+    return 'Strong sell'
+
+def format_scanner_value(field, value):
+    """Formats a scanner API value the way the screener CSV export writes it."""
+    if value is None:
+        return ''
+    if field in TECHNICAL_RATING_FIELDS:
+        return technical_rating_label(value)
+    if field == 'recommendation_mark':
+        return analyst_rating_label(value)
+    if field == 'indexes':
+        return ', '.join(index.get('name', '') for index in value)
+    return value
+
+def fetch_screener_csv(session_id, signature, download_abs_path):
+    """Fetches the screener results from TradingView's scanner API and writes them as CSV.
+    
+    Returns the path of the written CSV, or None if the request fails.
+    """
+    http = requests.Session()
+    http.headers.update({
+        'Origin': 'https://www.tradingview.com',
+        'Referer': TRADINGVIEW_URL,
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+    })
+    if session_id and signature:
+        http.headers['Cookie'] = f"sessionid={session_id}; sessionid_sign={signature}"
+
+    scanner_fields = list(dict.fromkeys(field for field, _ in SCANNER_COLUMNS))
+    payload = {
+        "markets": ["india"],
+        "symbols": {"query": {"types": []}, "tickers": []},
+        "options": {"lang": "en"},
+        "columns": scanner_fields,
+        # NSE common stock only. The saved screen's remaining filters have not been
+        # captured, so this CSV is only compared against the Selenium export (--scanner)
+        # and never uploaded in its place.
+        "filter": [
+            {"left": "exchange", "operation": "equal", "right": "NSE"},
+            {"left": "type", "operation": "equal", "right": "stock"}
+        ],
+        "sort": {"sortBy": "market_cap_basic", "sortOrder": "desc"},
+        "range": [0, SCANNER_MAX_ROWS]
+    }
+
+    try:
+        logging.info(f"Requesting screener data from {SCANNER_URL}")
+        response = http.post(SCANNER_URL, json=payload, timeout=SCANNER_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        rows = response.json()['data']
+    except (requests.RequestException, ValueError, KeyError) as e:
+        logging.error(f"Scanner API request failed: {e}")
+        return None
+
+    if not rows:
+        logging.error("Scanner API returned no rows.")
+        return None
+
+    csv_path = os.path.join(download_abs_path, f"{SCANNER_CSV_PREFIX}_{datetime.now().strftime('%Y-%m-%d')}.csv")
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow([header for _, header in SCANNER_COLUMNS])
+        for row in rows:
+            values = dict(zip(scanner_fields, row['d']))
+            writer.writerow([format_scanner_value(field, values.get(field)) for field, _ in SCANNER_COLUMNS])
+
+    logging.info(f"Wrote {len(rows)} rows from scanner API to {csv_path}")
+    return csv_path
+
+def read_csv_symbols(csv_path):
+    """Returns the set of values in the Symbol column of a screener CSV."""
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        return {row['Symbol'] for row in csv.DictReader(f) if row.get('Symbol')}
+
+def compare_scanner_csv(scanner_csv_path, export_csv_path):
+    """Logs how the scanner API symbols differ from the Selenium export's symbols."""
+    scanner_symbols = read_csv_symbols(scanner_csv_path)
+    export_symbols = read_csv_symbols(export_csv_path)
+    missing = sorted(export_symbols - scanner_symbols)
+    extra = sorted(scanner_symbols - export_symbols)
+    logging.info(
+        f"Scanner vs export: {len(scanner_symbols)} vs {len(export_symbols)} symbols, "
+        f"{len(missing)} missing from scanner, {len(extra)} only in scanner"
+    )
+    if missing:
+        logging.info(f"Missing from scanner (first 20): {missing[:20]}")
+    if extra:
+        logging.info(f"Only in scanner (first 20): {extra[:20]}")
+
+def get_chromedriver_path(refresh=False):
+    """Returns the pinned ChromeDriver path, downloading it via webdriver-manager if missing or refresh is set."""
+    if os.path.exists(CHROMEDRIVER_PATH) and not refresh:
+        return CHROMEDRIVER_PATH
+
+    from webdriver_manager.chrome import ChromeDriverManager
+    logging.info("Downloading ChromeDriver via webdriver-manager...")
+    installed_path = ChromeDriverManager().install()
+    os.makedirs(os.path.dirname(CHROMEDRIVER_PATH), exist_ok=True)
+    shutil.copy2(installed_path, CHROMEDRIVER_PATH)
+    logging.info(f"Pinned ChromeDriver at {CHROMEDRIVER_PATH}")
+    return CHROMEDRIVER_PATH
+
+def start_chrome(options, refresh_driver=False, refresh_on_mismatch=True):
+    """Starts a Chrome session with the pinned ChromeDriver.
+    
+    If the pinned driver doesn't support the installed Chrome (Chrome auto-updated past it)
+    and refresh_on_mismatch is set, ChromeDriver is re-downloaded once and the session retried.
+    Other session errors (no browser to attach to, locked profile) are raised as-is.
+    """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.common.exceptions import SessionNotCreatedException
+    try:
+        service = ChromeService(get_chromedriver_path(refresh_driver), log_output=subprocess.DEVNULL)
+        return webdriver.Chrome(service=service, options=options)
+    except SessionNotCreatedException as e:
+        if refresh_driver or not refresh_on_mismatch or CHROMEDRIVER_MISMATCH_TEXT not in (e.msg or ''):
+            raise
+        logging.warning(f"Pinned ChromeDriver does not match Chrome, refreshing it: {e.msg}")
+        service = ChromeService(get_chromedriver_path(refresh=True), log_output=subprocess.DEVNULL)
+        return webdriver.Chrome(service=service, options=options)
+
+def block_non_essential_requests(driver):
+    """Blocks images, fonts, media and analytics requests for the rest of the session."""
+    from selenium.common.exceptions import WebDriverException
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+    except WebDriverException as e:
+        logging.warning(f"Could not block non-essential requests: {e}")
+
+def attach_to_browser(download_abs_path, refresh_driver=False):
+    """Attaches to an already running Chrome via remote debugging; returns None if unavailable."""
+    from selenium import webdriver
+    from selenium.common.exceptions import WebDriverException
+    options = webdriver.ChromeOptions()
+    options.debugger_address = BROWSER_DEBUGGER_ADDRESS
+
+    try:
+        # No refresh retry here: a failed attach falls back to a cold start, which refreshes if needed
+        driver = start_chrome(options, refresh_driver, refresh_on_mismatch=False)
+        # Download prefs can't be applied to an existing browser, so set them over CDP
+        driver.execute_cdp_cmd('Browser.setDownloadBehavior', {'behavior': 'allow', 'downloadPath': download_abs_path})
+        driver.set_page_load_timeout(60)
+        block_non_essential_requests(driver)
+        logging.info(f"Attached to running browser at {BROWSER_DEBUGGER_ADDRESS}. Downloads will be saved to: {download_abs_path}")
+        return driver
+    except WebDriverException as e:
+        logging.warning(f"Could not attach to browser at {BROWSER_DEBUGGER_ADDRESS}, starting a new one: {e}")
+        return None
+
+def setup_driver(download_abs_path, refresh_driver=False):
     """Sets up the Chrome WebDriver with specified download preferences."""
+    from selenium import webdriver
+    from selenium.common.exceptions import WebDriverException
     
+    if REUSE_BROWSER:
+        driver = attach_to_browser(download_abs_path, refresh_driver)
+        if driver:
+            return driver
+
     # Setup virtual display first
     setup_virtual_display()
     
@@ -75,6 +446,8 @@ def setup_driver(download_abs_path):
         "safebrowsing.enabled": True
     }
     options.add_experimental_option("prefs", prefs)
+    # driver.get returns immediately; readiness is gated on explicit waits for the elements we use
+    options.page_load_strategy = 'none'
     
     # Essential headless options for server
     options.add_argument("--headless=new")  # Use new headless mode
@@ -84,8 +457,11 @@ def setup_driver(download_abs_path):
     options.add_argument("--disable-extensions")
     options.add_argument("--disable-plugins")
     options.add_argument("--disable-images")  # Speed up loading
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument("--start-maximized")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    options.add_argument("--window-size=1280,720")  # Small viewport, still wide enough for the screener toolbar
+    options.add_argument("--hide-scrollbars")
+    options.add_argument("--mute-audio")
+    options.add_argument(f"--user-data-dir={CHROME_PROFILE_DIR}")
     
     # Memory and performance optimizations
     options.add_argument("--memory-pressure-off")
@@ -103,84 +479,93 @@ def setup_driver(download_abs_path):
     options.add_argument("--ignore-certificate-errors-spki-list")
 
     try:
-        # Use webdriver-manager to automatically manage ChromeDriver
-        service = ChromeService(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
+        # Reuse the pinned ChromeDriver; webdriver-manager is only hit when it is missing or stale
+        driver = start_chrome(options, refresh_driver)
         driver.set_page_load_timeout(60)  # 60 second timeout
+        block_non_essential_requests(driver)
         logging.info(f"WebDriver initialized. Downloads will be saved to: {download_abs_path}")
         return driver
     except WebDriverException as e:
         logging.error(f"Failed to initialize WebDriver: {e}")
         return None
 
+def wait_for_page_ready(driver, timeout=10):
+    """Waits until the current document has finished loading."""
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+    try:
+        # With pageLoadStrategy 'none' the previous (blank) document may still be current
+        WebDriverWait(driver, timeout).until(
+            lambda d: d.execute_script("return document.readyState") == "complete"
+            and d.current_url != "about:blank"
+        )
+    except TimeoutException:
+        logging.warning(f"Page did not reach readyState 'complete' within {timeout}s. Continuing.")
+
+def wait_for_screener(driver, timeout=30):
+    """Waits until the screener's export menu trigger is visible and enabled."""
+    if wait_for_xpath(driver, MENU_TRIGGER_XPATH, timeout) is None:
+        logging.warning(f"Screener menu did not become clickable within {timeout}s. Continuing.")
+
+def has_valid_session(driver):
+    """Returns True if the browser already holds an unexpired TradingView sessionid cookie."""
+    now = time.time()
+    return any(
+        cookie.get('name') == 'sessionid' and cookie.get('expiry', now + 1) > now
+        for cookie in driver.get_cookies()
+    )
+
 def load_cookies_and_navigate(driver, url, base_script_path, cookies_file_name):
     """Loads cookies from a file and navigates to the URL."""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
     cookies_file_path = os.path.join(base_script_path, cookies_file_name)
     if not os.path.exists(cookies_file_path):
-        logging.warning(f"Cookies file not found: {cookies_file_path}. Proceeding without loading cookies.")
+        logging.warning("Cookies file not found: %s. Proceeding without loading cookies.", cookies_file_path)
         driver.get(url)
-        time.sleep(3) # Wait for page to load
+        wait_for_screener(driver)
         return
 
     try:
         base_url_domain = "https://www.tradingview.com"
-        logging.info(f"Navigating to base domain {base_url_domain} to set cookies.")
+        logging.info("Navigating to base domain %s to set cookies.", base_url_domain)
         driver.get(base_url_domain) 
-        time.sleep(2) # Allow page to settle for cookie context
+        wait_for_page_ready(driver) # Allow page to settle for cookie context
 
-        with open(cookies_file_path, 'r') as f:
-            loaded_json_data = json.load(f)
-        
-        actual_cookies_list = []
-        if isinstance(loaded_json_data, list):
-            actual_cookies_list = loaded_json_data
-            logging.info("cookies.json appears to be a direct list of cookies.")
-        elif isinstance(loaded_json_data, dict) and 'cookies' in loaded_json_data and isinstance(loaded_json_data['cookies'], list):
-            actual_cookies_list = loaded_json_data['cookies']
-            logging.info("Extracted cookie list from 'cookies' key in cookies.json.")
-        else:
-            logging.warning("Could not find a list of cookies in cookies.json. The file might be malformed or in an unexpected structure.")
-            # Fallback: try to iterate over it directly if it's some other iterable, though unlikely to work
-            if hasattr(loaded_json_data, '__iter__') and not isinstance(loaded_json_data, (str, bytes)):
-                 actual_cookies_list = list(loaded_json_data) 
-            else:
-                actual_cookies_list = []
+        # A persistent profile (or attached browser) may already be logged in
+        if has_valid_session(driver):
+            logging.info("Existing TradingView session found in browser profile. Skipping cookie load.")
+            driver.get(url)
+            wait_for_screener(driver)
+            return
+
+        actual_cookies_list = read_cookies_file(cookies_file_path)
 
         added_cookie_count = 0
         skipped_cookie_count = 0
+        cookies_to_add = []
 
         for cookie_data in actual_cookies_list:
             # Ensure cookie_data is a dictionary before proceeding
             if not isinstance(cookie_data, dict):
-                logging.info(f"Skipping non-dictionary item in cookies file: {cookie_data}")
+                logging.info("Skipping non-dictionary item in cookies file: %s", cookie_data)
                 skipped_cookie_count += 1
                 continue
 
-            cookie_to_add = {}
-            
             if 'name' not in cookie_data or 'value' not in cookie_data:
-                logging.info(f"Skipping cookie due to missing name or value. Cookie data: {cookie_data}")
+                logging.info("Skipping cookie due to missing name or value. Cookie data: %s", cookie_data)
                 skipped_cookie_count += 1
                 continue
             
-            cookie_to_add['name'] = cookie_data['name']
-            cookie_to_add['value'] = cookie_data['value']
+            cookie_to_add = {'name': cookie_data['name'], 'value': cookie_data['value']}
 
             # Optional but common keys
-            if 'path' in cookie_data: cookie_to_add['path'] = cookie_data['path']
-            if 'domain' in cookie_data: cookie_to_add['domain'] = cookie_data['domain']
-            if 'secure' in cookie_data: cookie_to_add['secure'] = cookie_data['secure']
-            if 'httpOnly' in cookie_data: cookie_to_add['httpOnly'] = cookie_data['httpOnly']
+            cookie_to_add.update({k: cookie_data[k] for k in COOKIE_KEYS if k in cookie_data})
             
-            # Handle expiry: Selenium expects 'expires' as an integer (Unix timestamp)
+            # Handle expiry: stored as 'expires', an integer Unix timestamp
             # cookies.json might use 'expiry' or 'expirationDate' and it might be float
-            expiry_value = None
-            if 'expires' in cookie_data: # If 'expires' is already the key
-                expiry_value = cookie_data['expires']
-            elif 'expiry' in cookie_data: # Common alternative key
-                expiry_value = cookie_data['expiry']
-            elif 'expirationDate' in cookie_data: # Another common alternative
-                expiry_value = cookie_data['expirationDate']
+            expiry_value = next((cookie_data[k] for k in COOKIE_EXPIRY_KEYS if k in cookie_data), None)
             
             if expiry_value is not None:
                 if isinstance(expiry_value, float):
@@ -189,199 +574,225 @@ def load_cookies_and_navigate(driver, url, base_script_path, cookies_file_name):
                     try:
                         cookie_to_add['expires'] = int(expiry_value)
                     except ValueError:
-                        logging.info(f"Could not convert expiry '{expiry_value}' to int for cookie {cookie_to_add['name']}. Cookie data: {cookie_data}")
+                        logging.info("Could not convert expiry '%s' to int for cookie %s. Cookie data: %s", expiry_value, cookie_to_add['name'], cookie_data)
                 else:
-                    logging.info(f"Unknown expiry type for cookie {cookie_to_add['name']}: {type(expiry_value)}. Cookie data: {cookie_data}")
+                    logging.info("Unknown expiry type for cookie %s: %s. Cookie data: %s", cookie_to_add['name'], type(expiry_value), cookie_data)
 
             if 'sameSite' in cookie_data:
-                if cookie_data['sameSite'] in ['Strict', 'Lax', 'None']:
+                if cookie_data['sameSite'] in COOKIE_SAME_SITE_VALUES:
                     cookie_to_add['sameSite'] = cookie_data['sameSite']
                 else:
                     cookie_to_add['sameSite'] = 'Lax' # Default to Lax if invalid
             
-            try:
-                driver.add_cookie(cookie_to_add)
-                added_cookie_count += 1
-            except Exception as cookie_error:
-                logging.warning(f"Could not add cookie: {cookie_to_add.get('name')}. Error: {cookie_error}. Details: {cookie_to_add}")
-                skipped_cookie_count += 1
+            cookies_to_add.append(cookie_to_add)
+
+        # Inject all cookies in one CDP round trip; CDP needs a url when no domain is given
+        cdp_cookies = [cookie if 'domain' in cookie else dict(cookie, url=base_url_domain) for cookie in cookies_to_add]
+        try:
+            driver.execute_cdp_cmd('Network.setCookies', {'cookies': cdp_cookies})
+            added_cookie_count = len(cdp_cookies)
+        except Exception as cdp_error:
+            logging.warning("Batch cookie injection via CDP failed: %s. Adding cookies one by one.", cdp_error)
+            for cookie_to_add in cookies_to_add:
+                try:
+                    driver.add_cookie(cookie_to_add)
+                    added_cookie_count += 1
+                except Exception as cookie_error:
+                    logging.warning("Could not add cookie: %s. Error: %s. Details: %s", cookie_to_add.get('name'), cookie_error, cookie_to_add)
+                    skipped_cookie_count += 1
 
         if added_cookie_count > 0:
-            logging.info(f"Successfully added {added_cookie_count} cookies. {skipped_cookie_count} cookies were skipped.")
+            logging.info("Successfully added %s cookies. %s cookies were skipped.", added_cookie_count, skipped_cookie_count)
         else:
-            logging.warning(f"No cookies were successfully added from {cookies_file_path}. {skipped_cookie_count} cookies were skipped. Login may not be active.")
+            logging.warning("No cookies were successfully added from %s. %s cookies were skipped. Login may not be active.", cookies_file_path, skipped_cookie_count)
         
-        logging.info(f"Refreshing page ({base_url_domain}) to apply cookies before navigating to target URL.")
+        logging.info("Refreshing page (%s) to apply cookies before navigating to target URL.", base_url_domain)
+        old_body = driver.find_element(By.TAG_NAME, 'body')
         driver.refresh()
-        time.sleep(3) # Wait for refresh and cookies to settle
+        WebDriverWait(driver, 10).until(EC.staleness_of(old_body))
+        wait_for_page_ready(driver) # Wait for refresh and cookies to settle
 
-        logging.info(f"Navigating to target URL: {url}")
+        logging.info("Navigating to target URL: %s", url)
         driver.get(url)
-        time.sleep(5) # Wait for page to load fully with cookies
-        logging.info(f"Navigation to {url} complete after attempting to load cookies.")
+        wait_for_screener(driver) # Wait for the screener to render with cookies
+        logging.info("Navigation to %s complete after attempting to load cookies.", url)
 
     except Exception as e:
-        logging.error(f"Error loading cookies or navigating: {e}", exc_info=True)
-        logging.info(f"Attempting to navigate to {url} without cookies as a fallback.")
+        logging.error("Error loading cookies or navigating: %s", e, exc_info=True)
+        logging.info("Attempting to navigate to %s without cookies as a fallback.", url)
         driver.get(url)
-        time.sleep(3)
+        wait_for_screener(driver)
+
+def wait_for_xpath(driver, xpath, timeout_seconds):
+    """Waits inside the browser for a visible, enabled element matching xpath.
+    
+    xpath may also be a list of XPaths; on each check they are tried in order, so an
+    earlier one wins when several match.
+    A MutationObserver resolves the wait as soon as the element appears, so this costs a
+    single WebDriver round trip instead of one per poll. Returns the element, or None on timeout.
+    """
+    driver.set_script_timeout(timeout_seconds + 5)
+    return driver.execute_async_script(WAIT_FOR_XPATH_JS, xpath, timeout_seconds * 1000)
 
 def click_export_button(driver):
     """Waits for and clicks the 'Export screen results' button using a two-step process."""
-    
-    # XPath for the element that opens the menu (e.g., a header or a menu button)
-    menu_trigger_xpath = "//*[@id='js-screener-container']/div[2]/div/div[1]/div[1]/div[1]/div/h2"
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.common.exceptions import TimeoutException, NoSuchElementException
     
     try:
         # Step 1: Click the element to open/reveal the export menu
-        logging.info(f"Attempting to click the menu trigger element with XPath: {menu_trigger_xpath}")
-        menu_trigger_element = WebDriverWait(driver, 30).until(
-            EC.element_to_be_clickable((By.XPATH, menu_trigger_xpath))
-        )
+        # (load_cookies_and_navigate already waited for it via wait_for_screener)
+        logging.info("Attempting to click the menu trigger element with XPath: %s", MENU_TRIGGER_XPATH)
+        try:
+            menu_trigger_element = driver.find_element(By.XPATH, MENU_TRIGGER_XPATH)
+        except NoSuchElementException:
+            logging.error("Menu trigger element not found on the screener page.")
+            return False
         driver.execute_script("arguments[0].scrollIntoView(true);", menu_trigger_element)
-        time.sleep(0.5) # Brief pause after scroll
+        WebDriverWait(driver, 5).until(EC.element_to_be_clickable(menu_trigger_element))
         menu_trigger_element.click()
         logging.info("Menu trigger element clicked successfully.")
 
-        # Wait for the menu to appear and the export item to be clickable
-        time.sleep(2) # Give the menu a couple of seconds to animate/load
-
         # Step 2: Find the 'Download results as CSV' item (previously called 'Export screen results')
-        # TradingView changed the button text
+        # TradingView has changed the button text over time, so match any known variant in one wait,
+        # preferring the exact item. The wait also covers the menu's open animation.
         logging.info("Attempting to find and click 'Download results as CSV' button")
-
-        # Try multiple approaches to find the download/export button
-        export_button = None
-
-        # Approach 1: Find by text 'Download results as CSV'
-        try:
-            export_button = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, "//div[contains(text(), 'Download results as CSV')]"))
-            )
-            logging.info("Found export button using 'Download results as CSV' text")
-        except TimeoutException:
-            logging.info("Could not find using approach 1, trying approach 2")
-            pass
-
-        # Approach 2: Find by partial text 'Download results'
-        if export_button is None:
-            try:
-                export_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//div[contains(text(), 'Download results')]"))
-                )
-                logging.info("Found export button using 'Download results' text")
-            except TimeoutException:
-                logging.info("Could not find using approach 2, trying approach 3")
-                pass
-
-        # Approach 3: Find span with download text
-        if export_button is None:
-            try:
-                export_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//span[contains(text(), 'Download results')]"))
-                )
-                logging.info("Found export button using span approach")
-            except TimeoutException:
-                logging.info("Could not find using approach 3, trying approach 4")
-                pass
-
-        # Approach 4: Find any element with 'CSV' in menu context
-        if export_button is None:
-            try:
-                export_button = WebDriverWait(driver, 10).until(
-                    EC.element_to_be_clickable((By.XPATH, "//*[contains(text(), 'CSV')]"))
-                )
-                logging.info("Found export button using CSV text")
-            except TimeoutException:
-                logging.info("Could not find using approach 4, trying approach 5")
-                pass
-
-        # Approach 5: Search all menu-like elements for download/CSV text
-        if export_button is None:
-            try:
-                all_elements = driver.find_elements(By.XPATH, "//*")
-                for el in all_elements:
-                    try:
-                        text = el.text.lower() if el.text else ""
-                        if 'download' in text and 'csv' in text and el.is_displayed():
-                            export_button = el
-                            logging.info(f"Found export button via full search: {el.text[:50]}")
-                            break
-                    except:
-                        pass
-            except Exception as e:
-                logging.info(f"Error in approach 5: {e}")
-                pass
+        export_button = wait_for_xpath(driver, EXPORT_BUTTON_XPATHS, 15)
+        if export_button and logging.getLogger().isEnabledFor(logging.INFO):  # .text costs a WebDriver round trip
+            logging.info("Found export button: %s", export_button.text[:50])
         
         # If we found a button, click it
         if export_button:
             # Scroll into view just in case it's needed
             driver.execute_script("arguments[0].scrollIntoView(true);", export_button)
-            time.sleep(0.5) # Brief pause after scroll before click
+            WebDriverWait(driver, 5).until(EC.element_to_be_clickable(export_button))
             export_button.click()
             logging.info("'Export screen results' item clicked successfully.")
             return True
         else:
-            logging.error("Could not find the 'Export screen results' button using any approach.")
+            logging.error("Could not find the 'Export screen results' button using any known selector.")
             return False
             
     except TimeoutException as e_timeout:
-        logging.error(f"Timeout: Could not find or click an element in the export process. Error: {e_timeout}")
+        logging.error("Timeout: Could not find or click an element in the export process. Error: %s", e_timeout)
         return False
     except Exception as e:
-        logging.error(f"An error occurred during the export click process: {e}", exc_info=True)
+        logging.error("An error occurred during the export click process: %s", e, exc_info=True)
         return False
 
-def wait_for_download_complete(download_path, timeout_seconds):
-    """Waits for a new CSV download to complete in the specified path."""
+def start_download_watch(download_path):
+    """Snapshots the download folder and, where available, adds an inotify watch on it.
+    
+    Call this before triggering the export so a download that finishes quickly is not missed.
+    Returns (watcher, initial_files); watcher is None when inotify is unavailable.
+    """
+    initial_files = frozenset(os.listdir(download_path))
+    if inotify is None:
+        return None, initial_files
+
+    watcher = inotify.adapters.Inotify()
+    watcher.add_watch(download_path, mask=inotify.constants.IN_CLOSE_WRITE | inotify.constants.IN_MOVED_TO)
+    return watcher, initial_files
+
+def stop_download_watch(watch, download_path):
+    """Removes the inotify watch added by start_download_watch, if any."""
+    watcher, _ = watch
+    if watcher is None:
+        return
+    try:
+        watcher.remove_watch(download_path)
+    except Exception:
+        pass
+
+def wait_for_download_complete(download_path, timeout_seconds, watch):
+    """Waits for a new CSV download to complete in the specified path.
+    
+    watch comes from start_download_watch(). With inotify, Chrome renaming the finished
+    '.crdownload' file to '.csv' fires IN_MOVED_TO as soon as the download completes;
+    events since the watch was added are queued, so none are lost while the export runs.
+    """
+    watcher, initial_files = watch
+    if watcher is None:
+        return poll_for_download_complete(download_path, timeout_seconds, initial_files)
+
+    logging.info("Waiting for download to complete in '%s'...", download_path)
+    deadline = time.time() + timeout_seconds
+
+    try:
+        for _, _, _, filename in watcher.event_gen(yield_nones=False, timeout_s=timeout_seconds):
+            if filename.lower().endswith(".csv") and not filename.startswith('.'):
+                csv_path = os.path.join(download_path, filename)
+                if not os.path.exists(csv_path + ".crdownload"):
+                    logging.info("Download of %s complete.", filename)
+                    return csv_path
+            if time.time() > deadline:
+                break
+    finally:
+        stop_download_watch(watch, download_path)
+
+    logging.error("Download timeout or failed to confirm completion.")
+    return None
+
+def poll_for_download_complete(download_path, timeout_seconds, initial_files=None):
+    """Waits for a new CSV download to complete by polling the specified path.
+    
+    initial_files is the folder snapshot taken before the export; files in it are ignored.
+    """
     start_time = time.time()
-    initial_files = set(os.listdir(download_path))
-    logging.info(f"Waiting for download to start in '{download_path}'...")
+    if initial_files is None:
+        initial_files = frozenset(os.listdir(download_path))
+    logging.info("Waiting for download to start in '%s'...", download_path)
 
     while time.time() - start_time < timeout_seconds:
-        current_files = set(os.listdir(download_path))
-        new_files = current_files - initial_files
-        
-        # Filter for .csv files, ignore temp/hidden files like .DS_Store or .crdownload parts
-        csv_files = [f for f in new_files if f.lower().endswith(".csv") and not f.startswith('.')]
+        # One pass over the directory per tick; DirEntry caches the name and stat result.
+        # Collect new .csv files (ignoring hidden files like .DS_Store) and in-progress .crdownload parts
+        csv_entries = []
+        crdownload_names = set()
+        with os.scandir(download_path) as it:
+            for entry in it:
+                name = entry.name.lower()
+                if name.endswith(".crdownload"):
+                    crdownload_names.add(entry.name)
+                elif name.endswith(".csv") and not name.startswith('.') and entry.name not in initial_files:
+                    csv_entries.append(entry)
         
-        if csv_files:
+        if csv_entries:
             # Find the most recently modified CSV file among the new ones
-            latest_csv_filename = max(csv_files, key=lambda f: os.path.getmtime(os.path.join(download_path, f)))
-            latest_csv_path = os.path.join(download_path, latest_csv_filename)
+            latest_csv = max(csv_entries, key=lambda e: e.stat().st_mtime)
+            latest_csv_filename = latest_csv.name
+            latest_csv_path = latest_csv.path
             
             # Check if a .crdownload file exists for this CSV (indicating it's still downloading)
             base_name_no_ext = os.path.splitext(latest_csv_filename)[0]
-            is_crdownload_present = any(
-                f.startswith(base_name_no_ext) and f.lower().endswith(".crdownload")
-                for f in os.listdir(download_path)
-            )
+            is_crdownload_present = any(name.startswith(base_name_no_ext) for name in crdownload_names)
 
             if not is_crdownload_present:
-                logging.info(f"Detected new CSV: {latest_csv_filename}. Checking for stability...")
+                logging.info("Detected new CSV: %s. Checking for stability...", latest_csv_filename)
                 last_size = -1
                 stable_check_start_time = time.time()
                 # Check for size stability for a few seconds
                 while time.time() - stable_check_start_time < 5:
                     try:
                         if not os.path.exists(latest_csv_path):
-                             logging.warning(f"CSV file {latest_csv_filename} disappeared during size check.")
+                             logging.warning("CSV file %s disappeared during size check.", latest_csv_filename)
                              break # break stability check, re-evaluate new files
                         current_size = os.path.getsize(latest_csv_path)
                         if current_size == last_size and current_size > 0:
-                            logging.info(f"Download of {latest_csv_filename} complete. Size: {current_size} bytes.")
+                            logging.info("Download of %s complete. Size: %s bytes.", latest_csv_filename, current_size)
                             return latest_csv_path
                         last_size = current_size
                     except FileNotFoundError:
-                        logging.warning(f"CSV file {latest_csv_filename} disappeared during size check.")
+                        logging.warning("CSV file %s disappeared during size check.", latest_csv_filename)
                         break 
                     time.sleep(1) 
                 # If stability check finishes and size was positive, assume complete
                 if last_size > 0:
-                    logging.info(f"Download of {latest_csv_filename} assumed complete by stability check. Size: {last_size} bytes.")
+                    logging.info("Download of %s assumed complete by stability check. Size: %s bytes.", latest_csv_filename, last_size)
                     return latest_csv_path
             else:
-                logging.info(f"CSV {latest_csv_filename} found, but .crdownload associated file is still present. Waiting...")
+                logging.info("CSV %s found, but .crdownload associated file is still present. Waiting...", latest_csv_filename)
         
         # Check generally for any .crdownload files if no specific new CSV is yet stable
         # crdownload_files_in_dir = [f for f in os.listdir(download_path) if f.lower().endswith(".crdownload")]
@@ -395,12 +806,20 @@ def wait_for_download_complete(download_path, timeout_seconds):
 
 def get_latest_downloaded_file(download_path, extension=".csv"):
     """Gets the most recently modified file with the given extension."""
-    if not os.path.isdir(download_path):
-        return None
-    files = [os.path.join(download_path, f) for f in os.listdir(download_path) if f.lower().endswith(extension)]
-    if not files:
+    latest_path = None
+    latest_mtime = -1.0
+    try:
+        # Single pass; DirEntry.stat() reuses the stat buffer from the directory scan
+        with os.scandir(download_path) as it:
+            for entry in it:
+                if entry.name.lower().endswith(extension):
+                    mtime = entry.stat().st_mtime
+                    if mtime > latest_mtime:
+                        latest_mtime = mtime
+                        latest_path = entry.path
+    except (FileNotFoundError, NotADirectoryError):
         return None
-    return max(files, key=os.path.getmtime)
+    return latest_path
 
 def delete_all_csv_files(download_path):
     """Deletes all CSV files in the specified directory."""
@@ -409,15 +828,14 @@ def delete_all_csv_files(download_path):
         return 0
     
     deleted_count = 0
-    for filename in os.listdir(download_path):
-        if filename.lower().endswith('.csv'):
-            file_path = os.path.join(download_path, filename)
-            try:
-                os.remove(file_path)
-                deleted_count += 1
-                logging.info(f"Deleted CSV file: {filename}")
-            except Exception as e:
-                logging.error(f"Failed to delete {filename}: {e}")
+    with os.scandir(download_path) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.lower().endswith('.csv'):
+                try:
+                    os.unlink(entry.path)
+                    deleted_count += 1
+                except OSError as e:
+                    logging.error(f"Failed to delete {entry.name}: {e}")
     
     if deleted_count > 0:
         logging.info(f"Successfully deleted {deleted_count} CSV file(s) from {download_path}")
@@ -427,7 +845,7 @@ def delete_all_csv_files(download_path):
     return deleted_count
 
 # --- Main Script Logic ---
-def main():
+def main(compare_scanner=False, refresh_driver=False):
     script_dir = SCRIPT_DIR
     download_abs_path = os.path.join(script_dir, DOWNLOAD_DIR_NAME)
 
@@ -443,26 +861,35 @@ def main():
     logging.info("Checking for existing CSV files in download directory...")
     delete_all_csv_files(download_abs_path)
 
-    driver = setup_driver(download_abs_path)
+    # Opt-in: fetch the scanner API results alongside the export so the two can be compared.
+    # The scanner CSV is not what gets uploaded until it is known to match the export.
+    scanner_csv_path = None
+    if compare_scanner:
+        session_id, signature = get_session_cookies(script_dir, COOKIES_FILE_NAME)
+        scanner_csv_path = fetch_screener_csv(session_id, signature, download_abs_path)
+
+    driver = setup_driver(download_abs_path, refresh_driver)
     if not driver:
         logging.error("Failed to setup driver")
         return
 
     try:
         load_cookies_and_navigate(driver, TRADINGVIEW_URL, script_dir, COOKIES_FILE_NAME)
-        
+
+        # Start watching before the click so a download that finishes immediately is still seen
+        download_watch = start_download_watch(download_abs_path)
         if not click_export_button(driver):
+            stop_download_watch(download_watch, download_abs_path)
             logging.error("Failed to click the export button. Exiting.")
             return # Exit if click fails
 
-        # Give a brief moment for the download process to initiate fully
-        time.sleep(5) 
-
-        downloaded_file_path = wait_for_download_complete(download_abs_path, DOWNLOAD_TIMEOUT_SECONDS)
+        downloaded_file_path = wait_for_download_complete(download_abs_path, DOWNLOAD_TIMEOUT_SECONDS, download_watch)
 
         if downloaded_file_path:
             logging.info(f"Successfully downloaded: {os.path.basename(downloaded_file_path)}")
             logging.info(f"Full path: {downloaded_file_path}")
+            if scanner_csv_path:
+                compare_scanner_csv(scanner_csv_path, downloaded_file_path)
         else:
             logging.error("Download failed or could not be confirmed.")
             # As a fallback, try to find the latest CSV if wait_for_download_complete failed but a file might exist
@@ -483,7 +910,10 @@ def main():
                 logging.warning("Failed to close WebDriver gracefully")
 
 def run_subsequent_scripts():
-    """Run uploadtodb.py and calcompositescore.py in sequence, regardless of success/failure."""
+    """Run uploadtodb.py and calcompositescore.py in sequence, regardless of success/failure.
+    
+    They must stay sequential: calcompositescore.py scores the stock_data rows uploadtodb.py writes.
+    """
     
     scripts_to_run = [
         'uploadtodb.py',
@@ -493,36 +923,38 @@ def run_subsequent_scripts():
     for script in scripts_to_run:
         script_path = os.path.join(SCRIPT_DIR, script)
         try:
-            logging.info(f"\n{'='*50}")
-            logging.info(f"Starting {script}...")
-            logging.info(f"{'='*50}")
+            logging.info("\n" + "=" * 50)
+            logging.info("Starting %s...", script)
+            logging.info("=" * 50)
             
-            # Run the script and capture output
-            result = subprocess.run(
+            # Run the script and forward its output to the log line by line as it is produced
+            process = subprocess.Popen(
                 [sys.executable, script_path],
-                check=False,  # Don't raise exception on non-zero exit code
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
+                bufsize=1,
                 cwd=SCRIPT_DIR  # Set working directory
             )
-            
-            # Log the output
-            if result.stdout:
-                logging.info(f"{script} output:\n{result.stdout}")
-            if result.stderr:
-                logging.error(f"{script} errors:\n{result.stderr}")
+            for line in process.stdout:
+                logging.info("[%s] %s", script, line.rstrip())
+            returncode = process.wait()
                 
-            logging.info(f"{script} completed with return code: {result.returncode}")
+            logging.info("%s completed with return code: %s", script, returncode)
             
         except Exception as e:
-            logging.error(f"Error running {script}: {str(e)}")
-        
-        # Add a small delay between script executions
-        time.sleep(2)
+            logging.error("Error running %s: %s", script, e)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the Technicals M screener results from TradingView.")
+    parser.add_argument('--scanner', action='store_true',
+                        help="Also fetch the scanner API results (not uploaded) and compare their symbols with the export")
+    parser.add_argument('--refresh-driver', action='store_true',
+                        help="Re-download ChromeDriver instead of reusing the pinned binary")
+    args = parser.parse_args()
+
     try:
-        main()
+        main(compare_scanner=args.scanner, refresh_driver=args.refresh_driver)
     finally:
         # Always run the subsequent scripts, even if main() fails
         run_subsequent_scripts()